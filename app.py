@@ -1,13 +1,13 @@
 import streamlit as st
 import pandas as pd
 import os
+import io
 from datetime import datetime
 from lotofacil import (
     carregar_dados,
     calcular_frequencia,
-    calcular_atrasos,
     calcular_pares_impares,
-    calcular_sequencias,
+    analisar_historico,
     analisar_combinacoes_repetidas,
     gerar_jogos_balanceados,
     gerar_jogos_por_desempenho,
@@ -26,6 +26,30 @@ from lotofacil import (
 st.set_page_config(page_title="Lotofácil Inteligente", page_icon="🎲", layout="wide")
 st.title("🎲 Painel Lotofácil Inteligente")
 
+# Tags de origem das dezenas (definidas uma vez, não a cada dezena exibida)
+_TAGS = {
+    "quente": "🔵", "fria": "🔴", "neutra": "⚪", "recente": "🟢",
+    "sequencia": "🟠", "alta_soma": "🟣", "baixa_soma": "🟤"
+}
+_EXPLICACOES = {
+    "quente": "Alta frequência recente.",
+    "fria": "Muito atrasada, chance de retorno.",
+    "recente": "Saiu há pouco tempo.",
+    "sequencia": "Consecutiva no jogo.",
+    "alta_soma": "Jogo de soma alta.",
+    "baixa_soma": "Jogo de soma baixa.",
+    "neutra": "Média estável."
+}
+_LEGENDA = {
+    "quente": "🔵 **Quente:** Alta frequência.",
+    "fria": "🔴 **Fria:** Longo atraso.",
+    "neutra": "⚪ **Neutra:** Média estável.",
+    "recente": "🟢 **Recente:** Saiu nos últimos 3.",
+    "sequencia": "🟠 **Sequência:** Consecutiva no jogo.",
+    "alta_soma": "🟣 **Alta Soma:** >210, arriscado.",
+    "baixa_soma": "🟤 **Baixa Soma:** <170, conservador."
+}
+
 # ==========================================================
 # 📂 Carregar base
 # ==========================================================
@@ -35,8 +59,40 @@ if st.button("🔄 Atualizar base com último concurso"):
     st.success(resultado)
     st.rerun()
 
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _carregar_base(file_path, mtime):
+    """
+    Carrega a base uma vez por processo; o mtime na chave invalida quando o CSV muda
+    e max_entries=1 descarta a versão anterior. Falha vira exceção para não ficar em cache.
+    """
+    df = carregar_dados(file_path)
+    if df is None:
+        raise RuntimeError(f"Não foi possível carregar {file_path}")
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def _frequencia(_df, chave_base, ultimos=None):
+    return calcular_frequencia(_df, ultimos)
+
+
+@st.cache_data(show_spinner=False)
+def _historico(_df, chave_base):
+    return analisar_historico(_df)
+
+
+@st.cache_data(show_spinner="Analisando combinações...")
+def _combinacoes(_df, chave_base):
+    """Análise de combinações (a mais pesada do painel), calculada uma vez por versão da base."""
+    return analisar_combinacoes_repetidas(_df)
+
+
 file_path = "Lotofacil_Concursos.csv"
-df = carregar_dados(file_path)
+chave_base = (file_path, os.path.getmtime(file_path) if os.path.exists(file_path) else 0)
+try:
+    df = _carregar_base(*chave_base)
+except RuntimeError:
+    df = None
 
 if df is None:
     st.error("❌ Erro ao carregar os concursos!")
@@ -62,7 +118,15 @@ aba = st.sidebar.radio(
 if aba == "📊 Painéis Estatísticos":
     st.header("📊 Painéis Estatísticos da Lotofácil")
 
-    ultimos = st.slider("Selecione quantos concursos deseja analisar:", 50, len(df), len(df))
+    # o slider só é lido ao clicar em "Aplicar": arrastar não recalcula os painéis a cada passo
+    ultimos_raw = st.slider("Selecione quantos concursos deseja analisar:", 50, len(df), len(df), key="ultimos_raw")
+    aplicar = st.button("✅ Aplicar")
+    if aplicar or "ultimos_aplicado" not in st.session_state:
+        st.session_state["ultimos_aplicado"] = ultimos_raw
+    # reenquadra a cada execução: a base pode ter mudado de tamanho depois do "Aplicar"
+    st.session_state["ultimos_aplicado"] = max(min(50, len(df)), min(st.session_state["ultimos_aplicado"], len(df)))
+    ultimos = st.session_state["ultimos_aplicado"]
+    st.caption(f"Analisando os últimos {ultimos} concursos.")
 
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📈 Frequência", "⏳ Atrasos", "⚖️ Pares/Ímpares",
@@ -71,28 +135,28 @@ if aba == "📊 Painéis Estatísticos":
 
     with tab1:
         st.subheader("📈 Frequência das Dezenas")
-        freq = calcular_frequencia(df, ultimos)
+        freq = _frequencia(df, chave_base, ultimos)
         st.bar_chart(freq.set_index("Dezena")["Frequência"])
-        st.dataframe(freq, use_container_width=True)
+        st.table(freq)
 
     with tab2:
         st.subheader("⏳ Atrasos das Dezenas")
-        atrasos = calcular_atrasos(df)
+        atrasos = _historico(df, chave_base)["atrasos"]
         st.bar_chart(atrasos.set_index("Dezena")["Atraso Atual"])
-        st.dataframe(atrasos, use_container_width=True)
+        st.table(atrasos)
 
     with tab3:
         st.subheader("⚖️ Distribuição de Pares e Ímpares")
         pares_impares = calcular_pares_impares(df)
-        st.dataframe(pares_impares, use_container_width=True)
+        st.table(pares_impares)
         st.markdown("💡 O equilíbrio ideal costuma ficar entre **6x9 e 9x6** (pares/ímpares).")
 
     with tab4:
         st.subheader("🔗 Combinações Mais Frequentes")
-        combinacoes = analisar_combinacoes_repetidas(df)
+        combinacoes = _combinacoes(df, chave_base)
         for tamanho, tabela in combinacoes.items():
             st.markdown(f"**Top 5 combinações de {tamanho} dezenas:**")
-            st.dataframe(tabela, use_container_width=True)
+            st.table(tabela)
 
     with tab5:
         st.subheader("➕ Análise da Soma Total das Dezenas")
@@ -106,9 +170,9 @@ if aba == "📊 Painéis Estatísticos":
 
     with tab6:
         st.subheader("📊 Tamanho das Sequências")
-        sequencias = calcular_sequencias(df)
+        sequencias = _historico(df, chave_base)["sequencias"]
         st.bar_chart(sequencias.set_index("Tamanho Sequência")["Ocorrências"])
-        st.dataframe(sequencias, use_container_width=True)
+        st.table(sequencias)
 
 # ==========================================================
 # 🎯 Aba 2 – Geração de Jogos
@@ -119,28 +183,32 @@ if aba == "🎯 Geração de Jogos":
     modo = st.radio("Selecione o tipo de geração:",
                     ["🧠 Geração Inteligente", "📈 Geração por Desempenho Histórico"])
 
+    # estatísticas compartilhadas pelos modos de geração (uma vez por versão da base)
+    historico = _historico(df, chave_base)
+    ranking = historico["frequencia"]
+    atrasos = historico["atrasos"]
+
     # --------------------------
     # 🧠 Geração Inteligente
     # --------------------------
     if modo == "🧠 Geração Inteligente":
         st.header("🧠 Geração de Jogos Inteligente com Explicações e Análises")
 
-        ranking = calcular_frequencia(df)
-        atrasos = calcular_atrasos(df)
-        top_atrasadas = atrasos.sort_values("Atraso Atual", ascending=False).head(3)
-        top_frequentes = ranking.sort_values("Frequência", ascending=False).head(10)
+        # ambos já vêm ordenados (Frequência / Atraso Atual decrescentes): basta fatiar
+        dezenas_frequentes = ranking["Dezena"].head(10).astype(int).tolist()
+        dezenas_atrasadas = atrasos["Dezena"].head(3).astype(int).tolist()
 
         col1, col2, col3 = st.columns(3)
-        col1.metric("🔥 Mais Frequente", f"{int(top_frequentes.iloc[0]['Dezena']):02d}",
-                    f"{int(top_frequentes.iloc[0]['Frequência'])}x")
-        col2.metric("🧊 Mais Atrasada", f"{int(top_atrasadas.iloc[0]['Dezena']):02d}",
-                    f"{int(top_atrasadas.iloc[0]['Atraso Atual'])} concursos")
+        col1.metric("🔥 Mais Frequente", f"{dezenas_frequentes[0]:02d}",
+                    f"{int(ranking['Frequência'].iat[0])}x")
+        col2.metric("🧊 Mais Atrasada", f"{dezenas_atrasadas[0]:02d}",
+                    f"{int(atrasos['Atraso Atual'].iat[0])} concursos")
         col3.metric("📅 Total de Concursos", len(df), "Histórico completo")
 
         st.markdown("---")
         st.subheader("🎯 Sugestão Automática (15 dezenas balanceadas)")
 
-        jogo_ideal = sorted(set(top_frequentes.head(10)["Dezena"]).union(set(top_atrasadas["Dezena"])))
+        jogo_ideal = sorted(set(dezenas_frequentes) | set(dezenas_atrasadas))
         faltam = 15 - len(jogo_ideal)
         if faltam > 0:
             adicionais = [d for d in range(1, 26) if d not in jogo_ideal][:faltam]
@@ -161,7 +229,9 @@ if aba == "🎯 Geração de Jogos":
             jogos_gerados = []
             for tam, qtd in qtd_jogos.items():
                 if qtd > 0:
-                    jogos_gerados.extend(gerar_jogos_balanceados(df, qtd_jogos=qtd, tamanho=tam))
+                    jogos_gerados.extend(gerar_jogos_balanceados(
+                        df, qtd_jogos=qtd, tamanho=tam, freq_df=ranking, atrasos_df=atrasos
+                    ))
 
             st.session_state["jogos_gerados"] = jogos_gerados
             st.success(f"✅ {len(jogos_gerados)} jogos gerados com análise estatística!")
@@ -169,28 +239,10 @@ if aba == "🎯 Geração de Jogos":
             st.markdown("---")
             st.subheader("📊 Análise Visual dos Jogos Gerados")
 
-            legenda = {
-                "quente": "🔵 **Quente:** Alta frequência.",
-                "fria": "🔴 **Fria:** Longo atraso.",
-                "neutra": "⚪ **Neutra:** Média estável.",
-                "recente": "🟢 **Recente:** Saiu nos últimos 3.",
-                "sequencia": "🟠 **Sequência:** Consecutiva no jogo.",
-                "alta_soma": "🟣 **Alta Soma:** >210, arriscado.",
-                "baixa_soma": "🟤 **Baixa Soma:** <170, conservador."
-            }
-
             jogos = st.session_state["jogos_gerados"]
             for idx, (jogo, origem) in enumerate(jogos, start=1):
-                display = []
-                for d in jogo:
-                    tag = origem.get(d, "neutra")
-                    emoji = {
-                        "quente": "🔵", "fria": "🔴", "neutra": "⚪", "recente": "🟢",
-                        "sequencia": "🟠", "alta_soma": "🟣", "baixa_soma": "🟤"
-                    }.get(tag, "⚪")
-                    display.append(f"{emoji} {d:02d}")
-
-                st.markdown(f"🎯 **Jogo {idx} ({len(jogo)} dezenas):** {' '.join(display)}")
+                display = " ".join(f"{_TAGS.get(origem.get(d, 'neutra'), '⚪')} {d:02d}" for d in jogo)
+                st.markdown(f"🎯 **Jogo {idx} ({len(jogo)} dezenas):** {display}")
 
                 pares = len([d for d in jogo if d % 2 == 0])
                 impares = len(jogo) - pares
@@ -205,26 +257,21 @@ if aba == "🎯 Geração de Jogos":
 
                 with st.expander(f"🔍 Explicação do raciocínio do Jogo {idx}"):
                     for d in jogo:
-                        tag = origem.get(d, "neutra")
-                        explicacao = {
-                            "quente": "Alta frequência recente.",
-                            "fria": "Muito atrasada, chance de retorno.",
-                            "recente": "Saiu há pouco tempo.",
-                            "sequencia": "Consecutiva no jogo.",
-                            "alta_soma": "Jogo de soma alta.",
-                            "baixa_soma": "Jogo de soma baixa.",
-                            "neutra": "Média estável."
-                        }.get(tag, "Sem destaque.")
+                        explicacao = _EXPLICACOES.get(origem.get(d, "neutra"), "Sem destaque.")
                         st.markdown(f"**{d:02d}** → {explicacao}")
 
                 st.markdown("---")
 
             with st.expander("🎨 Legenda das Cores e Critérios", expanded=True):
-                for _, desc in legenda.items():
+                for desc in _LEGENDA.values():
                     st.markdown(desc)
 
             st.success("💡 Cada cor representa um critério estatístico para facilitar sua análise.")
 
+            pdf_bytes = gerar_pdf_jogos(jogos, nome="Jogos Inteligentes", buf=io.BytesIO())
+            st.download_button("⬇️ Baixar PDF", pdf_bytes, file_name="jogos_inteligentes.pdf",
+                               mime="application/pdf")
+
     # --------------------------
     # 📈 Geração por Desempenho Histórico
     # --------------------------
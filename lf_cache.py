@@ -0,0 +1,90 @@
+"""
+Módulo: lf_cache.py
+
+Utilitários compartilhados por lotofacil.py e lf_core.py: memoização de
+valores derivados por DataFrame, conversão numérica das colunas de dezenas
+e contagem das combinações mais frequentes. Depende só de pandas/NumPy.
+"""
+
+import math
+import weakref
+from itertools import combinations
+import pandas as pd
+import numpy as np
+
+
+# Valores derivados de cada DataFrame, calculados uma vez e reaproveitados por
+# todas as funções: {id(df): (referência fraca ao df, nº de linhas, {nome: valor})}.
+# O df é tratado como imutável depois de carregado.
+_CACHE_MATRIZES = {}
+
+
+def cache_df(df, nome, construir):
+    """Retorna construir(df) memoizado por id(df); refaz se o df for outro ou mudar de tamanho."""
+    chave = id(df)
+    entrada = _CACHE_MATRIZES.get(chave)
+    if entrada is None or entrada[0]() is not df or entrada[1] != len(df):
+        ref = weakref.ref(df, lambda _, chave=chave: _CACHE_MATRIZES.pop(chave, None))
+        entrada = (ref, len(df), {})
+        _CACHE_MATRIZES[chave] = entrada
+    arrays = entrada[2]
+    if nome not in arrays:
+        arrays[nome] = construir(df)
+    return arrays[nome]
+
+
+def para_numerico(dados):
+    """Bloco de colunas -> matriz float (NaN = vazio/inválido) com um único pd.to_numeric."""
+    if all(pd.api.types.is_numeric_dtype(t) for t in dados.dtypes):
+        return dados.to_numpy(dtype=float, na_value=np.nan)
+    planas = pd.to_numeric(dados.to_numpy(dtype=object).ravel(), errors='coerce')
+    return np.asarray(planas, dtype=float).reshape(dados.shape)
+
+
+_BLOCO_CONCURSOS = 256  # concursos desdobrados por vez em top_combinacoes_por_indice
+
+
+def top_combinacoes_por_indice(ordenadas, tamanho, n=5):
+    """Top-n combinações de `tamanho` dezenas contadas por índice combinatório.
+
+    `ordenadas` (N, 15): dezenas distintas de cada concurso em ordem crescente,
+    com 0 (ausente) à esquerda. Cada combinação (d1 < ... < dk) vira
+    sum(C(di - 1, i)), um inteiro único em [0, C(25, k)), contado com
+    np.bincount. Os concursos são processados em blocos de _BLOCO_CONCURSOS
+    linhas, somando num único contador denso, para não materializar todas as
+    combinações do histórico de uma vez. Empates seguem a ordem de primeira
+    aparição (linha a linha, combinações em ordem lexicográfica), igual ao
+    Counter.most_common. Retorna [(combinação, ocorrências), ...].
+    """
+    indices = np.array(list(combinations(range(ordenadas.shape[1]), tamanho)), dtype=np.intp)
+    if indices.size == 0:
+        return []
+    binomiais = np.array([[math.comb(a, i) for i in range(tamanho + 1)] for a in range(26)], dtype=np.int32)
+    total = math.comb(25, tamanho)
+    por_linha = len(indices)
+    nunca = np.iinfo(np.int64).max
+
+    contagens = np.zeros(total, dtype=np.int64)
+    primeira = np.full(total, nunca, dtype=np.int64)                   # posição global (linha * C + coluna)
+    for inicio in range(0, len(ordenadas), _BLOCO_CONCURSOS):
+        grupos = ordenadas[inicio:inicio + _BLOCO_CONCURSOS][:, indices]   # (bloco, C, k), linhas já ordenadas
+        codigos = np.zeros(grupos.shape[:2], dtype=np.int32)
+        for i in range(tamanho):
+            codigos += binomiais[grupos[:, :, i].astype(np.intp) - 1, i + 1]
+        posicoes = np.flatnonzero(grupos[:, :, 0] > 0)                # zeros (ausentes) ficam à esquerda
+        codigos = codigos.ravel()[posicoes]
+        contagens += np.bincount(codigos, minlength=total)
+        # blocos em ordem: só a primeira ocorrência de códigos ainda não vistos é registrada
+        ineditos = np.flatnonzero(primeira[codigos] == nunca)
+        if ineditos.size:
+            vistos, locais = np.unique(codigos[ineditos], return_index=True)
+            primeira[vistos] = inicio * por_linha + posicoes[ineditos[locais]]
+
+    corte = max(np.partition(contagens, -n)[-n], 1) if contagens.size > n else 1
+    candidatos = np.flatnonzero(contagens >= corte)
+    ordem = candidatos[np.lexsort((primeira[candidatos], -contagens[candidatos]))[:n]]
+    linhas, colunas = np.divmod(primeira[ordem], por_linha)
+    return [
+        (tuple(int(d) for d in ordenadas[l, indices[c]]), int(contagens[i]))
+        for l, c, i in zip(linhas, colunas, ordem)
+    ]
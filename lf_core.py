@@ -7,11 +7,15 @@ Mantém compatibilidade com o app Streamlit fornecido.
 
 import os
 import re
+import heapq
 import random
-from collections import Counter, defaultdict
+from collections import Counter
 from itertools import combinations
 from datetime import datetime
 import pandas as pd
+import numpy as np
+
+from lf_cache import cache_df, para_numerico, top_combinacoes_por_indice
 
 # ---------------------------
 # Carregar dados do CSV
@@ -53,25 +57,55 @@ def _colunas_dezenas(df):
     detected = [c for c in cols if re.search(r'Bola', str(c), re.IGNORECASE)]
     return detected[:15]
 
-def _extrair_dezenas_row(row, dezenas_cols):
+def _valores_dezenas(df, dezenas_cols):
+    """Matriz float (N, k) das colunas de dezenas via pd.to_numeric (NaN = vazio/inválido)."""
+    return cache_df(df, ("valores", tuple(dezenas_cols)), lambda d: para_numerico(d[dezenas_cols]))
+
+def _linhas_numericas(valores):
+    """Por linha: dezenas distintas ordenadas (equivale a sorted(set(row.dropna().astype(int))))."""
+    return [sorted({int(v) for v in linha if v == v}) for linha in valores.tolist()]
+
+def _extrair_dezenas(df, dezenas_cols):
     """
-    Extrai até 15 dezenas válidas (1..25) de uma linha (pandas Series) usando regex.
+    Extrai as dezenas válidas (1..25) de todas as linhas de uma vez: uma lista
+    por linha, na ordem das colunas. Cada célula vale o primeiro grupo de 1-2
+    dígitos; células que já são só 1-2 dígitos não passam pela regex.
     """
-    dezenas = []
+    return cache_df(df, ("extraidas", tuple(dezenas_cols)), lambda d: _construir_dezenas_extraidas(d, dezenas_cols))
+
+def _construir_dezenas_extraidas(df, dezenas_cols):
+    colunas = []
     for c in dezenas_cols:
-        try:
-            val = row[c]
-        except Exception:
-            continue
-        if pd.isna(val):
-            continue
-        s = str(val).strip()
-        m = re.search(r'([0-9]{1,2})', s)
-        if m:
-            n = int(m.group(1))
-            if 1 <= n <= 25:
-                dezenas.append(n)
-    return dezenas[:15]
+        texto = df[c].astype("string").str.strip()
+        limpo = texto.str.isdigit().fillna(False) & (texto.str.len() <= 2).fillna(False)
+        valores = texto.where(limpo)
+        if not limpo.all():
+            sujos = texto[~limpo].str.extract(r'([0-9]{1,2})', expand=False)
+            valores = valores.fillna(sujos)
+        colunas.append(pd.to_numeric(valores, errors="coerce").fillna(0).astype(int).to_numpy())
+    if not colunas:
+        return [[] for _ in range(len(df))]
+    linhas = zip(*(c.tolist() for c in colunas))
+    return [[n for n in linha if 1 <= n <= 25][:15] for linha in linhas]
+
+def _mascara(dezenas):
+    """Bitmask (int) de um conjunto de dezenas: bit d-1 para cada d em 1..25 (interseção = popcount)."""
+    mascara = 0
+    for d in dezenas:
+        if 1 <= d <= 25:
+            mascara |= 1 << (d - 1)
+    return mascara
+
+def _mascaras_concursos(df, dezenas_cols):
+    """Bitmasks dos concursos com 15 dezenas válidas, em ordem (memoizado por DataFrame)."""
+    return cache_df(df, ("mascaras", tuple(dezenas_cols)), lambda d: [
+        _mascara(dez) for dez in _extrair_dezenas(d, dezenas_cols) if len(dez) == 15
+    ])
+
+def _no_dominio(valores):
+    """True se todos os valores presentes (não-NaN) de uma matriz float são inteiros em 1..25."""
+    presentes = valores[~np.isnan(valores)]
+    return bool(np.all((presentes >= 1) & (presentes <= 25) & (presentes == np.floor(presentes))))
 
 # ---------------------------
 # Atrasos
@@ -95,32 +129,29 @@ def calcular_atrasos(df):
 
         dezenas_cols = _colunas_dezenas(df)
         concursos = []
-        for _, row in df.iterrows():
-            dez = _extrair_dezenas_row(row, dezenas_cols)
+        for dez in _extrair_dezenas(df, dezenas_cols):
             if len(dez) == 15:
                 concursos.append(set(dez))
 
         if not concursos:
             return pd.DataFrame([[d,0,0] for d in range(1,26)], columns=["Dezena","Máx Atraso","Atraso Atual"])
 
-        max_atraso = {d:0 for d in range(1,26)}
-        contador = {d:0 for d in range(1,26)}
-
-        # do mais antigo para o mais recente
-        for sorteadas in concursos:
-            for d in range(1,26):
-                if d in sorteadas:
-                    max_atraso[d] = max(max_atraso[d], contador[d])
-                    contador[d] = 0
-                else:
-                    contador[d] += 1
-
-        atraso_atual = contador
-        for d in range(1,26):
-            max_atraso[d] = max(max_atraso[d], atraso_atual[d])
-
-        df_out = pd.DataFrame([[d, max_atraso[d], atraso_atual[d]] for d in range(1,26)],
-                              columns=["Dezena","Máx Atraso","Atraso Atual"])
+        # matriz de presença (N, 25), do mais antigo para o mais recente
+        n = len(concursos)
+        presenca = np.zeros((n, 25), dtype=bool)
+        linhas = np.repeat(np.arange(n), [len(s) for s in concursos])
+        dezenas = np.fromiter((d for s in concursos for d in s), dtype=np.intp, count=len(linhas))
+        presenca[linhas, dezenas - 1] = True
+
+        # atraso em cada concurso = índice atual - índice da última saída (máximo acumulado)
+        indices = np.arange(n)[:, None]
+        atrasos = indices - np.maximum.accumulate(np.where(presenca, indices, -1), axis=0)
+        max_atraso = atrasos.max(axis=0)
+        atraso_atual = atrasos[-1]
+
+        # mantém o sort_values original: a ordem dos empates alimenta random.sample em
+        # gerar_jogos_balanceados, e mudá-la mudaria os jogos de uma mesma seed
+        df_out = pd.DataFrame({"Dezena": list(range(1,26)), "Máx Atraso": max_atraso, "Atraso Atual": atraso_atual})
         return df_out.sort_values("Atraso Atual", ascending=False).reset_index(drop=True)
     except Exception as e:
         print(f"[lotofacil] Erro calcular_atrasos: {e}")
@@ -135,15 +166,11 @@ def calcular_frequencia(df, ultimos=None):
         return pd.DataFrame(columns=["Dezena","Frequência"])
     if ultimos is None or ultimos > len(df):
         ultimos = len(df)
-    dados = df.tail(ultimos)[dezenas_cols]
-    valores = pd.Series(pd.to_numeric(dados.values.flatten(), errors="coerce")).dropna().astype(int)
-    cont = Counter(valores)
-    todos = pd.DataFrame({"Dezena": list(range(1,26))})
-    freq = pd.DataFrame(cont.most_common(), columns=["Dezena","Frequência"])
-    freq["Dezena"] = freq["Dezena"].astype(int)
-    merged = todos.merge(freq, on="Dezena", how="left").fillna(0)
-    merged["Frequência"] = merged["Frequência"].astype(int)
-    return merged.sort_values("Frequência", ascending=False).reset_index(drop=True)
+    valores = np.trunc(_valores_dezenas(df, dezenas_cols)[len(df) - ultimos:].ravel())
+    valores = valores[(valores >= 1) & (valores <= 25)].astype(np.intp)
+    contagem = np.bincount(valores, minlength=26)[1:]
+    freq = pd.DataFrame({"Dezena": list(range(1,26)), "Frequência": contagem.astype(int)})
+    return freq.sort_values("Frequência", ascending=False).reset_index(drop=True)
 
 # ---------------------------
 # Pares / Ímpares
@@ -152,16 +179,11 @@ def calcular_pares_impares(df):
     dezenas_cols = _colunas_dezenas(df)
     if not dezenas_cols:
         return pd.DataFrame(columns=["Pares","Ímpares","Ocorrências"])
-    df_dez = df[dezenas_cols].apply(lambda col: pd.to_numeric(col, errors='coerce'))
-    resultados = []
-    for _, row in df_dez.iterrows():
-        nums = row.dropna().astype(int)
-        if len(nums) != 15:
-            continue
-        pares = sum(1 for n in nums if n % 2 == 0)
-        impares = 15 - pares
-        resultados.append((pares, impares))
-    df_stats = pd.DataFrame(resultados, columns=["Pares","Ímpares"])
+    valores = _valores_dezenas(df, dezenas_cols)
+    presentes = ~np.isnan(valores)
+    completos = presentes.sum(axis=1) == 15
+    pares = (presentes & (np.fmod(np.trunc(np.nan_to_num(valores)), 2) == 0)).sum(axis=1)[completos]
+    df_stats = pd.DataFrame({"Pares": pares, "Ímpares": 15 - pares})
     return df_stats.value_counts().reset_index(name="Ocorrências")
 
 # ---------------------------
@@ -171,23 +193,20 @@ def calcular_sequencias(df):
     dezenas_cols = _colunas_dezenas(df)
     if not dezenas_cols:
         return pd.DataFrame(columns=["Tamanho Sequência","Ocorrências"])
-    df_dez = df[dezenas_cols].apply(lambda col: pd.to_numeric(col, errors='coerce'))
-    seqs = Counter()
-    for _, row in df_dez.iterrows():
-        nums = sorted(set(row.dropna().astype(int).tolist()))
-        if len(nums) < 2:
-            continue
-        cur = 1
-        for i in range(1, len(nums)):
-            if nums[i] == nums[i-1] + 1:
-                cur += 1
-            else:
-                if cur >= 2:
-                    seqs[cur] += 1
-                cur = 1
-        if cur >= 2:
-            seqs[cur] += 1
-    return pd.DataFrame(seqs.items(), columns=["Tamanho Sequência","Ocorrências"]).sort_values("Tamanho Sequência").reset_index(drop=True)
+    valores = _valores_dezenas(df, dezenas_cols)
+    # matriz (N, 15) ordenada por linha com as dezenas distintas à esquerda e NaN à direita
+    # (equivale a sorted(set(row.dropna().astype(int))) em cada linha)
+    ordenada = np.sort(np.trunc(valores), axis=1)
+    ordenada[:, 1:][ordenada[:, 1:] == ordenada[:, :-1]] = np.nan
+    ordenada = np.sort(ordenada, axis=1)
+
+    # elos entre vizinhos consecutivos; um bloco de L elos é uma sequência de L+1 dezenas
+    elos = (np.diff(ordenada, axis=1) == 1).astype(np.int8)
+    borda = np.zeros((len(elos), 1), dtype=np.int8)
+    transicoes = np.diff(np.hstack([borda, elos, borda]), axis=1)
+    tamanhos = np.nonzero(transicoes == -1)[1] - np.nonzero(transicoes == 1)[1] + 1
+    tam, ocorrencias = np.unique(tamanhos, return_counts=True)
+    return pd.DataFrame({"Tamanho Sequência": tam, "Ocorrências": ocorrencias})
 
 # ---------------------------
 # Combinações Repetidas (2..5)
@@ -196,10 +215,12 @@ def analisar_combinacoes_repetidas(df, top_n_each=5):
     dezenas_cols = _colunas_dezenas(df)
     if not dezenas_cols:
         return {}
-    df_dez = df[dezenas_cols].apply(lambda col: pd.to_numeric(col, errors='coerce'))
+    valores = _valores_dezenas(df, dezenas_cols)
+    # todas as combinações por código inteiro (np.unique) quando as dezenas estão em 1..25
+    k_indexados = (2, 3, 4, 5) if _no_dominio(valores) else ()
+
     combos = Counter()
-    for _, row in df_dez.iterrows():
-        nums = sorted(set(row.dropna().astype(int).tolist()))
+    for nums in (_linhas_numericas(valores) if not k_indexados else []):
         if len(nums) < 2:
             continue
         for k in range(2,6):
@@ -207,12 +228,27 @@ def analisar_combinacoes_repetidas(df, top_n_each=5):
                 combos.update(combinations(nums, k))
     results = {}
     for k in range(2,6):
-        sub = [(c,v) for c,v in combos.items() if len(c)==k]
-        sub_sorted = sorted(sub, key=lambda x: x[1], reverse=True)[:top_n_each]
+        if k in k_indexados:
+            sub_sorted = _top_combinacoes_indexadas(valores, k, top_n_each)
+        else:
+            sub = [(c,v) for c,v in combos.items() if len(c)==k]
+            sub_sorted = sorted(sub, key=lambda x: x[1], reverse=True)[:top_n_each]
         results[k] = pd.DataFrame([(' '.join(f"{x:02d}" for x in combo), cnt) for combo,cnt in sub_sorted],
                                   columns=["Combinação","Ocorrências"])
     return results
 
+def _top_combinacoes_indexadas(valores, k, top_n):
+    """
+    Top combinações de k dezenas sem hashing de tuplas, contadas por índice
+    combinatório em blocos de concursos (lf_cache.top_combinacoes_por_indice).
+    Empates seguem a ordem da primeira aparição, como no Counter.
+    """
+    # dezenas distintas de cada linha, ordenadas, com 0 (vazio) à esquerda
+    linhas = np.sort(np.nan_to_num(valores, nan=0).astype(np.int8), axis=1)
+    linhas[:, 1:][linhas[:, 1:] == linhas[:, :-1]] = 0
+    linhas = np.sort(linhas, axis=1)
+    return top_combinacoes_por_indice(linhas, k, top_n)
+
 # ---------------------------
 # Gerar jogos balanceados
 # ---------------------------
@@ -228,8 +264,9 @@ def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15, seed=None):
 
     freq_df = calcular_frequencia(df)
     atrasos_df = calcular_atrasos(df)
-    top_freq = list(freq_df.sort_values("Frequência", ascending=False)["Dezena"].astype(int).tolist())
-    top_atraso = list(atrasos_df.sort_values("Atraso Atual", ascending=False)["Dezena"].astype(int).tolist())
+    # calcular_frequencia / calcular_atrasos já devolvem as tabelas em ordem decrescente
+    top_freq = freq_df["Dezena"].astype(int).tolist()
+    top_atraso = atrasos_df["Dezena"].astype(int).tolist()
 
    
 
@@ -242,6 +279,25 @@ def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15, seed=None):
     for _ in range(qtd_jogos):
         jogo = set()
         origem = {}
+        # comp[d]: tamanho da sequência que termina/começa em d (válido nas pontas);
+        # índices 0 e 26 são sentinelas sempre vazias
+        comp = [0] * 27
+        maxrun_atual = 0
+
+        def _run_com(d):
+            """Tamanho da sequência que d formaria ao entrar no jogo (O(1))."""
+            esq = comp[d - 1] if (d - 1) in jogo else 0
+            dir_ = comp[d + 1] if (d + 1) in jogo else 0
+            return esq, dir_, esq + dir_ + 1
+
+        def _adicionar(d):
+            nonlocal maxrun_atual
+            if d in jogo:
+                return
+            esq, dir_, run = _run_com(d)
+            comp[d - esq] = comp[d + dir_] = comp[d] = run
+            maxrun_atual = max(maxrun_atual, run)
+            jogo.add(d)
 
         # heurísticas de quantidades
         n_freq = min(6, max(3, tamanho//3))
@@ -250,13 +306,13 @@ def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15, seed=None):
         # adicionar frequentes
         chosen_freq = random.sample(top_freq, min(n_freq, len(top_freq)))
         for d in chosen_freq:
-            jogo.add(int(d)); origem[int(d)] = "quente"
+            _adicionar(int(d)); origem[int(d)] = "quente"
 
         # adicionar atrasadas
         chosen_atr = random.sample(top_atraso, min(n_atraso, len(top_atraso)))
         for d in chosen_atr:
             if d not in jogo:
-                jogo.add(int(d)); origem[int(d)] = "fria"
+                _adicionar(int(d)); origem[int(d)] = "fria"
 
         # completar evitando sequências longas
         pool = [d for d in range(1,26) if d not in jogo]
@@ -264,18 +320,12 @@ def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15, seed=None):
         for candidate in pool:
             if len(jogo) >= tamanho:
                 break
-            temp = sorted(list(jogo | {candidate}))
-            run = 1; maxrun = 1
-            for i in range(1, len(temp)):
-                if temp[i] == temp[i-1] + 1:
-                    run += 1; maxrun = max(maxrun, run)
-                else:
-                    run = 1
+            maxrun = max(maxrun_atual, _run_com(candidate)[2])
             if maxrun > allowed_seq:
                 # forte probabilidade de pular
                 if random.random() < 0.85:
                     continue
-            jogo.add(candidate); origem[int(candidate)] = origem.get(int(candidate), "neutra")
+            _adicionar(candidate); origem[int(candidate)] = origem.get(int(candidate), "neutra")
 
         # ajustar tamanho exato
         if len(jogo) > tamanho:
@@ -298,46 +348,61 @@ def gerar_jogos_por_desempenho(df, tamanho_jogo=15, faixa_desejada=11, top_n=5,
     cada combinação atingiu a faixa desejada (11..15). Retorna top_n melhores.
     """
     random.seed(seed or 0)
-    dezenas_cols = _colunas_dezenas(df)
-    concursos = []
-    for _, row in df.iterrows():
-        dez = _extrair_dezenas_row(row, dezenas_cols)
-        if len(dez) == 15:
-            concursos.append(set(dez))
+    concursos = _mascaras_concursos(df, _colunas_dezenas(df))
     if not concursos:
         return pd.DataFrame()
 
     n_concursos = len(concursos)
-    results = []
+    # min-heap com os top_n melhores até agora: (chave, -ordem, linha);
+    # em empate fica o candidato sorteado primeiro
+    melhores = []
     tried = set()
     for _ in range(sample_candidates):
         combo = tuple(sorted(random.sample(range(1,26), tamanho_jogo)))
         if combo in tried:
             continue
         tried.add(combo)
-        acertos = Counter()
+        acertos = [0] * 16          # acertos[h] = concursos com h acertos (só h >= 11 é contado)
         total_hits = 0
-        for sorteadas in concursos:
-            hits = len(set(combo) & sorteadas)
+        combo_mask = _mascara(combo)
+        # branch-and-bound: com o heap cheio, para de varrer assim que nem
+        # acertando todos os concursos restantes o candidato superaria o pior do top_n
+        pior = melhores[0][0] if top_n > 0 and len(melhores) >= top_n else None
+        descartado = False
+        for j, sorteadas in enumerate(concursos):
+            hits = (combo_mask & sorteadas).bit_count()
             if hits >= 11:
                 acertos[hits] += 1
                 total_hits += 1
-        if total_hits == 0:
+            if pior is not None and not j & 63:
+                restantes = n_concursos - j - 1
+                if (acertos[faixa_desejada] + restantes, total_hits + restantes) <= pior:
+                    descartado = True
+                    break
+        if descartado or total_hits == 0:
+            continue
+        desempenho_pct = (acertos[faixa_desejada] / n_concursos) * 100.0
+        chave = (acertos[faixa_desejada], total_hits)
+        if top_n <= 0 or (len(melhores) >= top_n and chave <= melhores[0][0]):
             continue
-        desempenho_pct = (acertos.get(faixa_desejada, 0) / n_concursos) * 100.0
-        results.append({
+        linha = {
             "Jogo": " ".join(f"{x:02d}" for x in combo),
             "Total": total_hits,
-            "11": acertos.get(11,0),
-            "12": acertos.get(12,0),
-            "13": acertos.get(13,0),
-            "14": acertos.get(14,0),
-            "15": acertos.get(15,0),
+            "11": acertos[11],
+            "12": acertos[12],
+            "13": acertos[13],
+            "14": acertos[14],
+            "15": acertos[15],
             "Faixa Base": faixa_desejada,
             "Desempenho (%)": round(desempenho_pct, 6)
-        })
+        }
+        item = (chave, -len(tried), linha)
+        if len(melhores) < top_n:
+            heapq.heappush(melhores, item)
+        else:
+            heapq.heapreplace(melhores, item)
 
-    df_res = pd.DataFrame(sorted(results, key=lambda r: (r[f"{faixa_desejada}"], r["Total"]), reverse=True)[:top_n])
+    df_res = pd.DataFrame([linha for _, _, linha in sorted(melhores, reverse=True)])
     return df_res
 
 # ---------------------------
@@ -348,10 +413,10 @@ def calcular_soma_total(df):
     if not dezenas_cols:
         return pd.DataFrame(), {"Soma Mínima":0,"Soma Média":0,"Soma Máxima":0}
     listas = []
-    for _, row in df.iterrows():
-        nums = _extrair_dezenas_row(row, dezenas_cols)
+    concursos = df["Concurso"] if "Concurso" in df.columns else [""] * len(df)
+    for concurso, nums in zip(concursos, _extrair_dezenas(df, dezenas_cols)):
         if len(nums) == 15:
-            listas.append((row.get("Concurso", ""), sum(nums)))
+            listas.append((concurso, sum(nums)))
     df_soma = pd.DataFrame(listas, columns=["Concurso","Soma"])
     resumo = {
         "Soma Mínima": int(df_soma["Soma"].min() if not df_soma.empty else 0),
@@ -364,32 +429,25 @@ def calcular_soma_total(df):
 # Avaliação histórica de jogos
 # ---------------------------
 def avaliar_jogos_historico(df, jogos):
-    dezenas_cols = _colunas_dezenas(df)
-    concursos = []
-    for _, row in df.iterrows():
-        dez = _extrair_dezenas_row(row, dezenas_cols)
-        if len(dez) == 15:
-            concursos.append(set(dez))
+    concursos = _mascaras_concursos(df, _colunas_dezenas(df))
     linhas = []
     for idx, item in enumerate(jogos, start=1):
         if isinstance(item, (list, tuple)) and isinstance(item[0], (list, tuple)):
             jogo = item[0]
         else:
             jogo = item if isinstance(item, (list, tuple)) else []
-        jogo_set = set(int(x) for x in jogo)
-        cont = Counter()
-        for s in concursos:
-            hits = len(jogo_set & s)
-            if hits >= 11:
-                cont[hits] += 1
+        jogo_mask = _mascara(int(x) for x in jogo)
+        cont = [0] * 16
+        for sorteadas in concursos:
+            cont[(jogo_mask & sorteadas).bit_count()] += 1
         linhas.append({
             "Jogo": idx,
             "Dezenas": " ".join(f"{d:02d}" for d in sorted(jogo)),
-            "11 pts": cont.get(11,0),
-            "12 pts": cont.get(12,0),
-            "13 pts": cont.get(13,0),
-            "14 pts": cont.get(14,0),
-            "15 pts": cont.get(15,0),
+            "11 pts": cont[11],
+            "12 pts": cont[12],
+            "13 pts": cont[13],
+            "14 pts": cont[14],
+            "15 pts": cont[15],
         })
     return pd.DataFrame(linhas)
 
@@ -9,16 +9,18 @@ Utiliza a nova base de dados Lotofacil_Concursos.csv como padrão.
 """
 
 import re
+import io
 import os
 import csv
 import json
+import time
 import uuid
-import random
-import base64
+import functools
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
-from collections import defaultdict
 from collections import Counter
 from itertools import combinations
 from datetime import datetime
@@ -26,6 +28,7 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 from github import Github  # Depende do ambiente
+from lf_cache import cache_df, para_numerico, top_combinacoes_por_indice
 
 
 
@@ -33,20 +36,65 @@ from github import Github  # Depende do ambiente
 # Carregar dados do CSV e Limpeza
 # ---------------------------
 
+def _caminho_parquet(file_path):
+    """Retorna o caminho do espelho Parquet ao lado do CSV (mesmo nome, extensão .parquet)."""
+    return os.path.splitext(file_path)[0] + ".parquet"
+
+
+def _csv_para_parquet(df, parquet_path):
+    """Grava o espelho Parquet da base já limpa (falha silenciosa: o CSV continua valendo)."""
+    try:
+        df.to_parquet(parquet_path, engine="pyarrow", index=False)
+    except Exception as e:
+        print(f"⚠️ Não foi possível gravar {parquet_path}: {e}")
+
+
 def carregar_dados(file_path="Lotofacil_Concursos.csv"):
     """
-    Lê o arquivo CSV, detecta separador, e aplica pré-limpeza bruta
-    nas colunas de dezenas para remover ruído antes do cálculo.
+    Lê o arquivo CSV já tipando as dezenas (Int8) no parser pyarrow; se o arquivo
+    tiver ruído nas dezenas, relê como texto e aplica a pré-limpeza bruta.
+
+    Após a primeira leitura, grava um espelho .parquet com Concurso (Int32)
+    e dezenas (Int8) já tipados; as próximas cargas usam o Parquet enquanto ele for
+    mais novo que o CSV.
     """
     try:
         # --- 1. Carregamento ---
         if not os.path.exists(file_path):
             print(f"⚠️ Arquivo {file_path} não encontrado.")
             return None
-        
+
+        parquet_path = _caminho_parquet(file_path)
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(file_path):
+            try:
+                return pd.read_parquet(parquet_path, engine="pyarrow")
+            except Exception as e:
+                print(f"⚠️ Parquet inválido ({e}), relendo o CSV.")
+
         # Assume o separador vírgula, comum em CSVs da Caixa/Web
         sep = "," 
-        df = pd.read_csv(file_path, sep=sep, engine="python", encoding="utf-8", on_bad_lines="skip", dtype=str)
+
+        # Caminho comum: o parser (pyarrow, ou C se o pyarrow faltar) já tipa
+        # Concurso (Int32) e dezenas (Int8) na leitura
+        cabecalho = list(pd.read_csv(file_path, sep=sep, encoding="utf-8", nrows=0).columns)
+        tipos = {col: "Int8" for col in cabecalho[2:17]}
+        if cabecalho:
+            tipos[cabecalho[0]] = "Int32"
+        try:
+            try:
+                # on_bad_lines="error": no pyarrow, "skip" descartaria também linhas com
+                # campos a menos, que o parser C e o caminho texto mantêm (completadas com NA)
+                df = pd.read_csv(file_path, sep=sep, encoding="utf-8", on_bad_lines="error",
+                                 dtype=tipos, na_values=["", "-"], engine="pyarrow")
+            except (ImportError, pd.errors.ParserError):
+                # sem pyarrow, ou linha com nº de campos diferente do cabeçalho: parser C
+                df = pd.read_csv(file_path, sep=sep, encoding="utf-8", on_bad_lines="skip",
+                                 dtype=tipos, na_values=["", "-"])
+            limpar = False
+        except (ValueError, TypeError, OverflowError):
+            # Arquivo com lixo nas dezenas: lê como texto e faz a limpeza bruta abaixo
+            df = pd.read_csv(file_path, sep=sep, engine="python", encoding="utf-8", on_bad_lines="skip", dtype=str)
+            limpar = True
         df = df.dropna(axis=1, how="all").dropna(how="all")
         
         # --- 2. Identificação das colunas 2 a 16 ---
@@ -58,12 +106,21 @@ def carregar_dados(file_path="Lotofacil_Concursos.csv"):
         else:
              dezenas_cols = all_cols[2:17]
 
-        # --- 3. Limpeza Bruta (Remove tudo que não é dígito ou NaN) ---
+        # --- 3. Limpeza Bruta (Remove tudo que não é dígito ou NaN) — só no caminho texto ---
+        if limpar and dezenas_cols:
+            # uma única passada da regex sobre todas as células de dezenas, achatadas numa Series
+            bloco = df[dezenas_cols].astype(str)
+            limpo = pd.Series(bloco.to_numpy().ravel()).str.replace(r'[^\d]', '', regex=True)
+            df[dezenas_cols] = limpo.to_numpy().reshape(bloco.shape)
+
+        # --- 4. Tipagem: Concurso em Int32 e dezenas (1..25) em Int8; fora do domínio vira NA ---
+        df[all_cols[0]] = pd.to_numeric(df[all_cols[0]], errors="coerce").astype("Int32")
         for col in dezenas_cols:
             if col in df.columns:
-                # Remove todos os caracteres que não são dígitos (0-9)
-                df[col] = df[col].astype(str).str.replace(r'[^\d]', '', regex=True)
-        
+                valores = pd.to_numeric(df[col], errors="coerce")
+                df[col] = valores.where((valores >= 1) & (valores <= 25)).astype("Int8")
+
+        _csv_para_parquet(df, parquet_path)
         return df
 
     except Exception as e:
@@ -82,6 +139,133 @@ def _colunas_dezenas(df):
     return cols[2:17]
 
 
+def _construir_matriz_dezenas(df):
+    dados = df[_colunas_dezenas(df)]
+    if all(pd.api.types.is_integer_dtype(t) for t in dados.dtypes):
+        # base vinda de carregar_dados/Parquet: já tipada (Int8), sem reconversão
+        valores = dados.to_numpy(dtype=np.int16, na_value=0)
+    else:
+        valores = para_numerico(dados)
+    validos = (valores >= 1) & (valores <= 25)
+    return np.where(validos, valores, 0).astype(np.int8)
+
+
+def _matriz_dezenas(df):
+    """
+    Dezenas como matriz int8 (N, 15), na ordem das colunas Bola1..Bola15.
+    Valores ausentes ou fora de 1..25 viram 0. Calculada uma vez por DataFrame.
+    """
+    return cache_df(df, "dezenas", _construir_matriz_dezenas)
+
+
+def _construir_matriz_presenca(df):
+    dezenas = _matriz_dezenas(df)
+    linhas, colunas = np.nonzero(dezenas)
+    presenca = np.zeros((len(dezenas), 25), dtype=bool)
+    presenca[linhas, dezenas[linhas, colunas] - 1] = True
+    return presenca
+
+
+def _matriz_presenca(df):
+    """
+    Matriz booleana (N, 25): presenca[i, d-1] é True quando a dezena d saiu
+    no concurso i. Valores ausentes ou fora de 1..25 são ignorados.
+    """
+    return cache_df(df, "presenca", _construir_matriz_presenca)
+
+
+def _construir_mascaras(df):
+    pesos = np.left_shift(np.uint32(1), np.arange(25, dtype=np.uint32))
+    return _matriz_presenca(df).astype(np.uint32) @ pesos
+
+
+def _mascaras_concursos(df):
+    """Cada concurso como bitmask uint32 (N,): bit d-1 ligado quando a dezena d saiu."""
+    return cache_df(df, "mascaras", _construir_mascaras)
+
+
+def _concursos_completos(df):
+    """Linhas com as 15 dezenas válidas (as demais não entram nas contagens de acertos)."""
+    return (_matriz_dezenas(df) > 0).sum(axis=1) >= 15
+
+
+def _mascara_jogo(jogo):
+    """Bitmask (int) de um jogo: bit d-1 para cada dezena d."""
+    mascara = 0
+    for d in set(int(x) for x in jogo):
+        mascara |= 1 << (d - 1)
+    return mascara
+
+
+@functools.lru_cache(maxsize=None)
+def _tabela_pop16():
+    """Popcount de todos os valores de 16 bits (64 KB), montada uma vez sob demanda."""
+    tabela = np.zeros(1 << 16, dtype=np.uint8)
+    for bit in range(16):
+        tabela[1 << bit:1 << (bit + 1)] = tabela[:1 << bit] + 1
+    return tabela
+
+
+def _popcount32(valores):
+    """Quantidade de bits ligados em cada elemento de um array uint32 (= tamanho da interseção)."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0: instrução POPCNT
+        return np.bitwise_count(valores)
+    # NumPy antigo: duas consultas na tabela de 16 bits por valor
+    valores = np.asarray(valores, dtype=np.uint32)
+    tabela = _tabela_pop16()
+    return tabela[valores & 0xFFFF] + tabela[valores >> 16]
+
+
+_BLOCO_JOGOS = 256  # jogos comparados por vez com o histórico em _histograma_acertos
+
+
+def _histograma_acertos(jogos, concursos):
+    """
+    Para cada jogo (bitmask uint32), quantos concursos tiveram 0..15 acertos: array (K, 16).
+    Processa blocos de _BLOCO_JOGOS jogos (matriz (bloco, N) de popcounts) para limitar a memória.
+    """
+    histograma = np.empty((len(jogos), 16), dtype=np.int64)
+    for inicio in range(0, len(jogos), _BLOCO_JOGOS):
+        bloco = jogos[inicio:inicio + _BLOCO_JOGOS]
+        acertos = _popcount32(bloco[:, None] & concursos[None, :]).astype(np.intp)
+        # um único bincount para o bloco: cada jogo na sua faixa de 16 posições
+        deslocamento = 16 * np.arange(len(bloco))[:, None]
+        histograma[inicio:inicio + len(bloco)] = np.bincount(
+            (acertos + deslocamento).ravel(), minlength=16 * len(bloco)
+        ).reshape(-1, 16)
+    return histograma
+
+
+def _dezenas_da_mascara(mascara):
+    """Dezenas (ordenadas) com bit ligado num bitmask."""
+    return [d for d in range(1, 26) if int(mascara) >> (d - 1) & 1]
+
+
+def _top_combinacoes(combos, contagens, presenca, n=5):
+    """Monta o DataFrame das n combinações mais frequentes.
+
+    `combos` (C, k) vem em ordem lexicográfica. Empates seguem a ordem de
+    primeira aparição (concurso em que a combinação saiu primeiro; no mesmo
+    concurso, ordem lexicográfica), igual ao Counter.most_common.
+    """
+    corte = max(np.partition(contagens, -n)[-n], 1) if contagens.size > n else 1
+    candidatos = np.flatnonzero(contagens >= corte)
+    if candidatos.size == 0:
+        return pd.DataFrame(columns=["Combinação", "Ocorrências"])
+    saiu = presenca[:, combos[candidatos] - 1].all(axis=2)         # (N, candidatos)
+    primeira = saiu.argmax(axis=0)
+    ordem = candidatos[np.lexsort((candidatos, primeira, -contagens[candidatos]))[:n]]
+    return pd.DataFrame(
+        [(tuple(int(d) for d in combos[i]), int(contagens[i])) for i in ordem],
+        columns=["Combinação", "Ocorrências"]
+    )
+
+
+def _top_combinacoes_por_indice(ordenadas, tamanho, n=5):
+    """Top-n combinações de `tamanho` dezenas (contagem em blocos, ver lf_cache.top_combinacoes_por_indice)."""
+    return pd.DataFrame(top_combinacoes_por_indice(ordenadas, tamanho, n), columns=["Combinação", "Ocorrências"])
+
+
 def calcular_atrasos(df):
     """
     Calcula:
@@ -93,46 +277,30 @@ def calcular_atrasos(df):
         return pd.DataFrame(columns=["Dezena", "Máx Atraso", "Atraso Atual"])
 
     try:
-        # 1️⃣ Extrai e limpa as dezenas
-        dezenas_cols = _colunas_dezenas(df)
-        df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-        df_dezenas = df_dezenas.mask((df_dezenas < 1) | (df_dezenas > 25))
-
-        # Cria lista de sets (cada linha = dezenas sorteadas no concurso)
-        concursos = [set(row.dropna().astype(int).tolist()) for _, row in df_dezenas.iterrows()]
-        if not concursos:
+        # 1️⃣ Matriz de presença (N, 25), em ordem cronológica
+        presenca = _matriz_presenca(df)
+        n = len(presenca)
+        if n == 0:
             raise ValueError("Nenhuma dezena válida foi extraída.")
 
-        # 2️⃣ Inicializa contadores
-        max_atraso = {d: 0 for d in range(1, 26)}
-        atraso_atual = {d: 0 for d in range(1, 26)}
-        contador = {d: 0 for d in range(1, 26)}
-
-        # 3️⃣ Itera sobre todos os concursos (em ordem cronológica)
-        for dezenas_sorteadas in concursos:
-            for d in range(1, 26):
-                if d in dezenas_sorteadas:
-                    # Se saiu, zera o contador e registra o maior atraso
-                    max_atraso[d] = max(max_atraso[d], contador[d])
-                    contador[d] = 0
-                else:
-                    # Se não saiu, incrementa o atraso
-                    contador[d] += 1
-
-        # 4️⃣ Após percorrer tudo:
-        # O contador final contém o atraso atual
-        for d in range(1, 26):
-            atraso_atual[d] = contador[d]
-            max_atraso[d] = max(max_atraso[d], atraso_atual[d])
-
-        # 5️⃣ Retorna DataFrame organizado
+        # 2️⃣ Atraso em cada concurso = concursos desde a última saída: o índice da
+        #    última saída até ali vem de um máximo acumulado (zera quando a dezena sai).
+        indices = np.arange(n, dtype=np.int32)[:, None]
+        ultima_saida = np.maximum.accumulate(np.where(presenca, indices, np.int32(-1)), axis=0)
+        atrasos = indices - ultima_saida                     # (N, 25)
+        max_atraso = atrasos.max(axis=0).astype(np.int64)
+        atraso_atual = atrasos[-1].astype(np.int64)
+
+        # 5️⃣ Retorna DataFrame já na ordem final (Atraso Atual decrescente;
+        #    empates em ordem crescente de dezena, ordenação estável)
+        ordem = np.argsort(-atraso_atual, kind="stable")
         df_out = pd.DataFrame(
             {
-                "Dezena": list(range(1, 26)),
-                "Máx Atraso": [max_atraso[d] for d in range(1, 26)],
-                "Atraso Atual": [atraso_atual[d] for d in range(1, 26)]
+                "Dezena": ordem + 1,
+                "Máx Atraso": max_atraso[ordem],
+                "Atraso Atual": atraso_atual[ordem]
             }
-        ).sort_values("Atraso Atual", ascending=False).reset_index(drop=True)
+        )
 
         return df_out
 
@@ -150,18 +318,10 @@ def calcular_frequencia(df, ultimos=None):
     if ultimos is None or ultimos > len(df):
         ultimos = len(df)
         
-    dados = df.tail(ultimos)[dezenas_cols]
-    valores = pd.to_numeric(dados.values.flatten(), errors="coerce")
-    valores_limpos = pd.Series(valores)
-    valores_limpos = valores_limpos[(valores_limpos >= 1) & (valores_limpos <= 25)].dropna().astype(int)
-    
-    contagem = Counter(valores_limpos)
-    ranking = pd.DataFrame(contagem.most_common(), columns=["Dezena", "Frequência"])
-    
-    todas_dezenas = pd.DataFrame({"Dezena": range(1, 26)})
-    ranking = todas_dezenas.merge(ranking, on="Dezena", how="left").fillna(0)
-    ranking["Frequência"] = ranking["Frequência"].astype(int)
-    
+    dados = _matriz_dezenas(df)[len(df) - ultimos:]
+    contagem = np.bincount(dados.ravel(), minlength=26)[1:]   # posição 0 = inválidas
+
+    ranking = pd.DataFrame({"Dezena": range(1, 26), "Frequência": contagem.astype(int)})
     return ranking.sort_values("Frequência", ascending=False).reset_index(drop=True)
 
 
@@ -172,22 +332,21 @@ def calcular_pares_impares(df):
     if not dezenas_cols:
         return pd.DataFrame(columns=["Pares", "Ímpares", "Ocorrências"])
         
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    
-    resultados = []
-    for _, row in df_dezenas.iterrows():
-        dezenas = row.dropna().astype(int)
-        dezenas = dezenas[(dezenas >= 1) & (dezenas <= 25)]
-        
-        if len(dezenas) != 15:
-            continue
-        
-        pares = sum(1 for d in dezenas if d % 2 == 0)
-        impares = 15 - pares
-        resultados.append((pares, impares))
-        
-    df_stats = pd.DataFrame(resultados, columns=["Pares", "Ímpares"])
-    return df_stats.value_counts().reset_index(name="Ocorrências").sort_values("Ocorrências", ascending=False)
+    # só concursos com as 15 dezenas válidas
+    dezenas = _matriz_dezenas(df)[_concursos_completos(df)]
+    pares = ((dezenas & 1) == 0).sum(axis=1)
+
+    # só 16 resultados possíveis (0..15 pares): um bincount, sem ordenar N valores;
+    # mais frequentes primeiro (empates pela quantidade de pares)
+    contagem = np.bincount(pares, minlength=16)
+    valores = np.flatnonzero(contagem)
+    ocorrencias = contagem[valores]
+    ordem = np.argsort(-ocorrencias, kind="stable")
+    return pd.DataFrame({
+        "Pares": valores[ordem],
+        "Ímpares": 15 - valores[ordem],
+        "Ocorrências": ocorrencias[ordem]
+    })
 
 
 def calcular_sequencias(df):
@@ -196,27 +355,30 @@ def calcular_sequencias(df):
     if not dezenas_cols:
         return pd.DataFrame(columns=["Tamanho Sequência", "Ocorrências"])
         
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    sequencias = Counter()
-    
-    for _, row in df_dezenas.iterrows():
-        dezenas = sorted(row.dropna().astype(int))
-        if len(dezenas) < 15:
-            continue
+    # Sequências = blocos de True consecutivos em cada linha da matriz de presença:
+    # com bordas zeradas, diff == 1 marca o início e diff == -1 o fim de cada bloco.
+    presenca = _matriz_presenca(df)[_concursos_completos(df)].astype(np.int8)
+    borda = np.zeros((len(presenca), 1), dtype=np.int8)
+    transicoes = np.diff(np.hstack([borda, presenca, borda]), axis=1)
+    tamanhos = np.nonzero(transicoes == -1)[1] - np.nonzero(transicoes == 1)[1]
+
+    valores, ocorrencias = np.unique(tamanhos[tamanhos >= 2], return_counts=True)
+    return pd.DataFrame({"Tamanho Sequência": valores, "Ocorrências": ocorrencias})
 
-        seq = 1
-        for i in range(1, len(dezenas)):
-            if dezenas[i] == dezenas[i - 1] + 1:
-                seq += 1
-            else:
-                if seq >= 2:
-                    sequencias[seq] += 1
-                seq = 1
-        if seq >= 2:
-            sequencias[seq] += 1
-            
-    return pd.DataFrame(sequencias.items(), columns=["Tamanho Sequência", "Ocorrências"])\
-             .sort_values("Tamanho Sequência").reset_index(drop=True)
+
+def analisar_historico(df):
+    """
+    Frequência, atrasos e sequências de todo o histórico numa só chamada.
+    As três análises saem da mesma matriz de presença e o resultado fica
+    memoizado por DataFrame. Retorna {"frequencia", "atrasos", "sequencias"}.
+    """
+    historico = cache_df(df, "historico", lambda d: {
+        "frequencia": calcular_frequencia(d),
+        "atrasos": calcular_atrasos(d),
+        "sequencias": calcular_sequencias(d),
+    })
+    # cópias rasas: quem chamar pode ordenar/alterar sem mexer no cache
+    return {nome: tabela.copy() for nome, tabela in historico.items()}
 
 
 def analisar_combinacoes_repetidas(df):
@@ -225,18 +387,40 @@ def analisar_combinacoes_repetidas(df):
     if not dezenas_cols:
         return {}
     
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    
-    resultados = {}
-    for tamanho in range(2, 6):  # duplas a quinas
-        combos = Counter()
-        for _, row in df_dezenas.iterrows():
-            dezenas = sorted(row.dropna().astype(int))
+    # Duplas e trincas: histogramas densos via produto de matrizes de presença
+    presenca = _matriz_presenca(df).astype(np.float32)
+    i_par, j_par = np.triu_indices(25, k=1)                     # 300 duplas em ordem lexicográfica
+    coocorrencia = presenca.T @ presenca                         # (25, 25)
+    duplas = np.column_stack([i_par, j_par]) + 1
+
+    presenca_pares = presenca[:, i_par] * presenca[:, j_par]     # (N, 300): dupla presente no concurso
+    por_par_e_dezena = presenca_pares.T @ presenca               # (300, 25)
+    indice_par = np.full((25, 25), -1, dtype=np.intp)
+    indice_par[i_par, j_par] = np.arange(len(i_par))
+    trincas = np.array(list(combinations(range(25), 3)))
+    contagem_trincas = por_par_e_dezena[indice_par[trincas[:, 0], trincas[:, 1]], trincas[:, 2]]
+
+    presenca_bool = _matriz_presenca(df)
+    resultados = {
+        2: _top_combinacoes(duplas, coocorrencia[i_par, j_par].astype(np.int64), presenca_bool),
+        3: _top_combinacoes(trincas + 1, contagem_trincas.astype(np.int64), presenca_bool),
+    }
+
+    # Quadras e quinas: cada combinação vira um índice inteiro (sem tuplas) num histograma denso
+    ordenadas = np.sort(_matriz_dezenas(df), axis=1)
+    repetidas = ((ordenadas[:, 1:] == ordenadas[:, :-1]) & (ordenadas[:, 1:] > 0)).any()
+    for tamanho in (4, 5):
+        if not repetidas:
+            resultados[tamanho] = _top_combinacoes_por_indice(ordenadas, tamanho)
+            continue
+        # Concursos com dezena repetida na linha: mantém a contagem por tuplas
+        contador = Counter()
+        for linha in ordenadas.tolist():
+            dezenas = [d for d in linha if d > 0]
             if len(dezenas) >= tamanho:
-                combos.update(combinations(dezenas, tamanho))
-        top5 = combos.most_common(5)
-        resultados[tamanho] = pd.DataFrame(top5, columns=["Combinação", "Ocorrências"])
-    
+                contador.update(combinations(dezenas, tamanho))
+        resultados[tamanho] = pd.DataFrame(contador.most_common(5), columns=["Combinação", "Ocorrências"])
+
     return resultados  # dicionário: {2:df_duplas, 3:df_trincas, 4:df_quadras, 5:df_quinas}
 
 
@@ -246,15 +430,17 @@ def calcular_soma_total(df):
     if not dezenas_cols:
         return pd.DataFrame(columns=["Concurso", "Soma"])
     
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    df_soma = pd.DataFrame()
-    df_soma["Concurso"] = pd.to_numeric(df.iloc[:, 0], errors='coerce')
-    df_soma["Soma"] = df_dezenas.sum(axis=1)
+    # soma direto da matriz int8 em cache (acumulando em int64); o DataFrame é montado de uma vez
+    soma = _matriz_dezenas(df).sum(axis=1, dtype=np.int64)
+    df_soma = pd.DataFrame({
+        "Concurso": pd.to_numeric(df.iloc[:, 0], errors='coerce'),
+        "Soma": soma,
+    }, index=df.index)
     
-    # Estatísticas principais
-    soma_min = df_soma["Soma"].min()
-    soma_max = df_soma["Soma"].max()
-    soma_media = df_soma["Soma"].mean()
+    # Estatísticas principais (sobre o array, sem passar pelas Series)
+    soma_min = soma.min() if soma.size else np.nan
+    soma_max = soma.max() if soma.size else np.nan
+    soma_media = soma.mean() if soma.size else np.nan
     
     resumo = {
         "Soma Mínima": soma_min,
@@ -268,7 +454,13 @@ def calcular_soma_total(df):
 # ---------------------------
 # Funções de Geração de Jogos
 # ---------------------------
-def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15):
+# Códigos de origem usados em gerar_jogos_balanceados (índice em _ROTULOS_ORIGEM)
+_ROTULOS_ORIGEM = ("", "quente", "fria", "neutra", "recente", "sequencia", "alta_soma", "baixa_soma")
+(_ORIGEM_QUENTE, _ORIGEM_FRIA, _ORIGEM_NEUTRA, _ORIGEM_RECENTE,
+ _ORIGEM_SEQUENCIA, _ORIGEM_ALTA_SOMA, _ORIGEM_BAIXA_SOMA) = range(1, 8)
+
+
+def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15, freq_df=None, atrasos_df=None):
     """
     Gera jogos indicando a origem/tag de cada dezena:
       - 'quente'   -> dezenas frequentes
@@ -276,106 +468,81 @@ def gerar_jogos_balanceados(df, qtd_jogos=4, tamanho=15):
       - 'neutra'   -> escolhidas aleatoriamente
       - 'recente'  -> saiu em um dos últimos 3 concursos
       - 'sequencia'-> parte de sequência dentro do jogo
+    freq_df / atrasos_df: resultados já calculados de calcular_frequencia /
+    calcular_atrasos (todo o histórico, já ordenados por Frequência / Atraso
+    Atual decrescente); quando omitidos, vêm de analisar_historico.
     Retorna lista de (jogo_sorted_list, origem_dict)
     """
     try:
         if tamanho < 15 or tamanho > 20:
             raise ValueError("tamanho deve estar entre 15 e 20")
 
-        # colunas de dezenas (assume col 2..16)
-        all_cols = list(df.columns)
-        dezenas_cols = all_cols[2:17] if len(all_cols) >= 17 else _colunas_dezenas(df)
-
-        # frequência (todo histórico)
-        freq_df = calcular_frequencia(df, ultimos=len(df))
+        # frequência e atrasos (todo histórico), numa única análise memoizada
+        if freq_df is None or atrasos_df is None:
+            historico = analisar_historico(df)
+            freq_df = historico["frequencia"] if freq_df is None else freq_df
+            atrasos_df = historico["atrasos"] if atrasos_df is None else atrasos_df
         top_freq = freq_df.head(12)["Dezena"].astype(int).tolist() if not freq_df.empty else list(range(1, 26))
-
-        # atrasos
-        atrasos_df = calcular_atrasos(df)
-        top_atraso = atrasos_df.sort_values("Atraso Atual", ascending=False)["Dezena"].astype(int).head(12).tolist()
+        top_atraso = atrasos_df["Dezena"].astype(int).head(12).tolist()
 
         # recentes: últimos 3 concursos
-        recentes_set = set()
-        try:
-            ult_rows = df.tail(3)[dezenas_cols]
-            for _, r in ult_rows.iterrows():
-                for v in r:
-                    try:
-                        n = int(str(v).strip())
-                        if 1 <= n <= 25:
-                            recentes_set.add(n)
-                    except:
-                        continue
-        except Exception:
-            recentes_set = set()
-
+        ultimas = _matriz_dezenas(df)[-3:]
+        recente = np.zeros(26, dtype=bool)
+        recente[ultimas[ultimas > 0]] = True
+
+        # 1-3) sorteios de todos os jogos em lote (numpy.Generator), uma linha por jogo
+        rng = np.random.default_rng()
+        top_freq = np.array(top_freq, dtype=np.intp)
+        top_atraso = np.array(top_atraso, dtype=np.intp)
+        qtd_freq = min(6, tamanho - 5, len(top_freq))
+        qtd_atr = min(4, tamanho - qtd_freq, len(top_atraso))
+        escolhidas_freq = rng.permuted(np.tile(top_freq, (qtd_jogos, 1)), axis=1)[:, :qtd_freq]
+        escolhidas_atr = rng.permuted(np.tile(top_atraso, (qtd_jogos, 1)), axis=1)[:, :qtd_atr]
+
+        linhas = np.arange(qtd_jogos)[:, None]
+        presente = np.zeros((qtd_jogos, 26), dtype=bool)   # coluna 0 sem uso
+        presente[linhas, escolhidas_freq] = True
+        presente[linhas, escolhidas_atr] = True
+        faltam = tamanho - presente.sum(axis=1)
+
+        # completa com as dezenas ausentes de menor chave aleatória (sem repetição, sem retentativas)
+        chaves = rng.random((qtd_jogos, 26))
+        chaves[presente] = 2.0
+        chaves[:, 0] = 3.0
+        posicao = np.empty((qtd_jogos, 26), dtype=np.intp)
+        posicao[linhas, np.argsort(chaves, axis=1)] = np.arange(26)
+        neutras = posicao < faltam[:, None]
+
+        # origem de cada dezena como código uint8 (uma linha por jogo, coluna = dezena);
+        # gravado da menor para a maior prioridade: neutra < fria < quente
+        origem = np.zeros((qtd_jogos, 26), dtype=np.uint8)
+        origem[neutras] = _ORIGEM_NEUTRA
+        origem[linhas, escolhidas_atr] = _ORIGEM_FRIA
+        origem[linhas, escolhidas_freq] = _ORIGEM_QUENTE
+        no_jogo = origem > 0
+
+        # 4) recentes sobrescrevem qualquer tag
+        origem[no_jogo & recente] = _ORIGEM_RECENTE
+
+        # 5) sequências dentro do jogo (ex.: 05 e 06 consecutivos): dezena com vizinha
+        #    d-1 ou d+1 no jogo; só substitui 'neutra' (as demais tags têm prioridade)
+        vizinha = np.zeros_like(no_jogo)
+        vizinha[:, 1:] = no_jogo[:, :-1]
+        vizinha[:, :-1] |= no_jogo[:, 1:]
+        origem[no_jogo & vizinha & (origem == _ORIGEM_NEUTRA)] = _ORIGEM_SEQUENCIA
+
+        # 6) soma extrema (interpretada na UI): só as neutras restantes são remarcadas
+        soma = no_jogo @ np.arange(26)
+        neutras_restantes = origem == _ORIGEM_NEUTRA
+        origem[neutras_restantes & (soma > 210)[:, None]] = _ORIGEM_ALTA_SOMA
+        origem[neutras_restantes & (soma < 170)[:, None]] = _ORIGEM_BAIXA_SOMA
+
+        # 7) dicionários só na saída: jogo ordenado -> nome da origem
         jogos = []
-        for _ in range(qtd_jogos):
-            jogo = set()
-            origem = {}
-
-            # 1) adiciona algumas frequentes
-            qtd_freq = min(6, tamanho - 5)
-            escolhidas_freq = random.sample(top_freq, min(qtd_freq, len(top_freq)))
-            for d in escolhidas_freq:
-                jogo.add(int(d))
-                origem[int(d)] = "quente"
-
-            # 2) adiciona algumas atrasadas
-            qtd_atr = min(4, tamanho - len(jogo))
-            escolhidas_atr = random.sample(top_atraso, min(qtd_atr, len(top_atraso)))
-            for d in escolhidas_atr:
-                if d not in jogo:
-                    jogo.add(int(d))
-                    # se já for 'quente', mantém 'quente' (mas preferimos 'quente' sobre 'fria'?)
-                    origem[int(d)] = origem.get(int(d), "fria")
-
-            # 3) completa aleatoriamente
-            while len(jogo) < tamanho:
-                d = random.randint(1, 25)
-                if d not in jogo:
-                    jogo.add(d)
-                    origem[d] = origem.get(d, "neutra")
-
-            # 4) marca recentes (sobrescreve 'neutra' para 'recente' quando aplicável)
-            for d in list(jogo):
-                if d in recentes_set:
-                    origem[d] = "recente"
-
-            # 5) detecta sequências dentro do jogo (ex.: 05 e 06 consecutivos)
-            sorted_jogo = sorted(jogo)
-            sequencia_indices = set()
-            for i in range(1, len(sorted_jogo)):
-                if sorted_jogo[i] == sorted_jogo[i - 1] + 1:
-                    sequencia_indices.add(sorted_jogo[i])
-                    sequencia_indices.add(sorted_jogo[i - 1])
-            # marca sequencia (mantendo prioridade: recente/quente/fria > sequencia? 
-            # aqui vamos anotar sequencia como adicional: se origin == 'neutra' substitui, 
-            # caso contrário acrescentamos prefixo 'sequencia' mantendo visibilidade)
-            for d in sequencia_indices:
-                # se neutra -> sequencia; se já tiver tag diferente, prefixamos com 'sequencia' por info
-                if origem.get(d) == "neutra":
-                    origem[d] = "sequencia"
-                else:
-                    # manter a tag principal (não sobrescrever), mas também podemos sinalizar
-                    origem[d] = origem[d]  # mantemos a tag principal (UI pode mostrar ícone de sequência também)
-
-            # 6) ajuste final da origem para os inteiros do jogo
-            jogo_final = sorted(int(x) for x in sorted_jogo)
-            origem_final = {int(d): origem.get(int(d), "neutra") for d in jogo_final}
-
-            # 7) marca soma extrema (será interpretada na UI): não sobrescreve tags, só retorna info na origem_final
-            soma = sum(jogo_final)
-            if soma > 210:
-                # marca qualquer dezena neutra como 'alta_soma' (opcional); preferimos não sobrescrever principal
-                for d in jogo_final:
-                    if origem_final[d] == "neutra":
-                        origem_final[d] = "alta_soma"
-            elif soma < 170:
-                for d in jogo_final:
-                    if origem_final[d] == "neutra":
-                        origem_final[d] = "baixa_soma"
-
+        for i in range(qtd_jogos):
+            jogo_final = np.flatnonzero(no_jogo[i]).tolist()
+            codigos = origem[i, jogo_final].tolist()
+            origem_final = {d: _ROTULOS_ORIGEM[c] for d, c in zip(jogo_final, codigos)}
             jogos.append((jogo_final, origem_final))
 
         return jogos
@@ -393,56 +560,64 @@ def gerar_jogos_por_desempenho(df, tamanho_jogo=15, faixa_desejada=11, top_n=5):
     - tamanho_jogo: 15 a 20 dezenas
     - faixa_desejada: 11 a 15
     - top_n: quantidade de melhores combinações a retornar
+    Jogos e concursos são bitmasks uint32: os acertos de todas as combinações contra
+    todos os concursos saem de AND + popcount em blocos (_histograma_acertos).
     """
-    dezenas_cols = [c for c in df.columns if "Bola" in c or "Dezena" in c]
-    if not dezenas_cols:
-        raise ValueError("Não foram encontradas colunas de dezenas no arquivo CSV.")
-
-    # Converte dezenas para numérico
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    historico = [set(row.dropna().astype(int)) for _, row in df_dezenas.iterrows() if len(row.dropna()) >= 15]
-
-    if not historico:
+    dezenas = _matriz_dezenas(df)
+    completos = _concursos_completos(df)
+    if not completos.any():
         raise ValueError("Histórico vazio ou inválido.")
-
-    contador_combinacoes = Counter()
-
-    # Avalia frequência de acertos
-    for dezenas_sorteadas in historico:
-        # Todas as combinações possíveis dentro das dezenas sorteadas com o tamanho escolhido
-        if len(dezenas_sorteadas) >= tamanho_jogo:
-            for combo in combinations(sorted(dezenas_sorteadas), tamanho_jogo):
-                contador_combinacoes[combo] += 1
-
-    # Agora avaliamos quantas vezes cada combinação acertaria "faixa_desejada"
+    historico = _mascaras_concursos(df)[completos]
+
+    # Combinações candidatas: subconjuntos do tamanho pedido de cada sorteio (ordem de aparição, sem repetição)
+    if tamanho_jogo == 15:
+        # cada sorteio completo é o próprio candidato: deduplica direto nos bitmasks
+        _, primeira = np.unique(historico, return_index=True)
+        jogos = historico[np.sort(primeira)]
+    else:
+        sorteios = np.sort(dezenas[completos], axis=1).tolist()
+        candidatos = list(dict.fromkeys(
+            combo for sorteio in sorteios if len(sorteio) >= tamanho_jogo
+            for combo in combinations(sorteio, tamanho_jogo)
+        ))
+        if not candidatos:
+            raise ValueError(f"Nenhum sorteio histórico contém combinações de {tamanho_jogo} dezenas.")
+        pesos = np.left_shift(np.uint32(1), np.asarray(candidatos, dtype=np.uint32) - 1)
+        jogos = np.bitwise_or.reduce(pesos, axis=1)
+
+    # Acertos de cada combinação em cada concurso, resumidos por faixa: (U, 5) para 11..15
+    contagens = _histograma_acertos(jogos, historico)[:, 11:16]
+    total = contagens.sum(axis=1)
+    desempenho = contagens[:, faixa_desejada - 11]
+
+    n = len(df)
+    # seleção parcial: só os candidatos acima do corte do top_n são ordenados (empates por ordem de aparição)
+    if 0 < top_n < len(desempenho):
+        corte = np.partition(desempenho, len(desempenho) - top_n)[len(desempenho) - top_n]
+        candidatos = np.flatnonzero(desempenho >= corte)
+        melhores = candidatos[np.argsort(-desempenho[candidatos], kind="stable")[:top_n]]
+    else:
+        melhores = np.argsort(-desempenho, kind="stable")[:top_n]
     resultados = []
-    for combo, _ in contador_combinacoes.items():
-        acertos = {i: 0 for i in range(11, 16)}
-        for dezenas_sorteadas in historico:
-            intersec = len(set(combo) & dezenas_sorteadas)
-            if 11 <= intersec <= 15:
-                acertos[intersec] += 1
+    for i in melhores:
+        acertos_i = {k: int(contagens[i, k - 11]) for k in range(11, 16)}
         resultados.append({
-            "Jogo": combo,
+            "Jogo": " ".join(f"{d:02d}" for d in _dezenas_da_mascara(jogos[i])),
             # total de acertos (11 a 15) e percentual em relação ao total de concursos
-            "Total": f"{sum(acertos.values())} / {sum(acertos.values()) * 100 / len(df):.1f}%",
+            "Total": f"{total[i]} / {total[i] * 100 / n:.1f}%",
             # detalhamento de acertos individuais
-            "Acertos 11": acertos[11],
-            "Acertos 12": acertos[12],
-            "Acertos 13": acertos[13],
-            "Acertos 14": acertos[14],
-            "Acertos 15": acertos[15],
+            "Acertos 11": acertos_i[11],
+            "Acertos 12": acertos_i[12],
+            "Acertos 13": acertos_i[13],
+            "Acertos 14": acertos_i[14],
+            "Acertos 15": acertos_i[15],
             # faixa base que o usuário escolheu (ex: 11, 12, 13...)
             "Faixa Base": faixa_desejada,
             # desempenho dentro da faixa base e percentual em relação ao total de concursos
-            "Desempenho": f"{acertos[faixa_desejada]} / {acertos[faixa_desejada] * 100 / len(df):.1f}%"
+            "Desempenho": f"{desempenho[i]} / {desempenho[i] * 100 / n:.1f}%"
         })
 
-    df_resultados = pd.DataFrame(resultados)
-    df_resultados = df_resultados.sort_values("Desempenho", ascending=False).head(top_n)
-    df_resultados["Jogo"] = df_resultados["Jogo"].apply(lambda x: " ".join(f"{d:02d}" for d in x))
-
-    return df_resultados.reset_index(drop=True)
+    return pd.DataFrame(resultados)
 
 
 
@@ -452,11 +627,22 @@ def gerar_jogos_por_desempenho(df, tamanho_jogo=15, faixa_desejada=11, top_n=5):
 # Funções de Serviço e Avaliação (Simuladas/Adaptadas)
 # ---------------------------
 
+# Tabela de preços por quantidade de dezenas (constante: não reconstruir a cada chamada)
+PRECOS_APOSTA = {15: 3.50, 16: 56.00, 17: 476.00, 18: 2856.00, 19: 13566.00, 20: 54264.00}
+
+
 def calcular_valor_aposta(qtd_dezenas):
     """Calcula o custo da aposta."""
-    precos = {15: 3.50, 16: 56.00, 17: 476.00, 18: 2856.00, 19: 13566.00, 20: 54264.00}
-    return precos.get(qtd_dezenas, 0)
+    return PRECOS_APOSTA.get(qtd_dezenas, 0)
+
+
 
+# Conexão reaproveitada entre chamadas (evita novo handshake TCP/TLS a cada rerun do app)
+_SESSAO_API = requests.Session()
+
+# Última resposta da API: validadores HTTP para requisição condicional + resultado já montado
+_CACHE_API = {"etag": None, "last_modified": None, "resultado": None, "instante": 0.0}
+_TTL_API = 60  # segundos em que o resultado é reutilizado sem consultar a API
 
 
 def obter_concurso_atual_api():
@@ -468,11 +654,26 @@ def obter_concurso_atual_api():
         "dataApuracao": str (ex: "16/10/2025"),
         "dezenas": [int, int, ...]
     }
+    O resultado é reaproveitado por _TTL_API segundos; depois disso a consulta
+    é condicional (If-None-Match / If-Modified-Since) e um 304 reusa o anterior.
     """
     try:
+        agora = time.monotonic()
+        if _CACHE_API["resultado"] and agora - _CACHE_API["instante"] < _TTL_API:
+            return _CACHE_API["resultado"]
+
         url = "https://servicebus2.caixa.gov.br/portaldeloterias/api/lotofacil"
         headers = {"accept": "application/json"}
-        response = requests.get(url, headers=headers, timeout=10)
+        if _CACHE_API["resultado"]:
+            if _CACHE_API["etag"]:
+                headers["If-None-Match"] = _CACHE_API["etag"]
+            if _CACHE_API["last_modified"]:
+                headers["If-Modified-Since"] = _CACHE_API["last_modified"]
+        response = _SESSAO_API.get(url, headers=headers, timeout=10)
+
+        if response.status_code == 304 and _CACHE_API["resultado"]:
+            _CACHE_API["instante"] = agora
+            return _CACHE_API["resultado"]
 
         if response.status_code != 200:
             print(f"❌ Erro HTTP {response.status_code} ao consultar API da Caixa.")
@@ -488,16 +689,68 @@ def obter_concurso_atual_api():
         # Converte dezenas para inteiros
         dezenas = [int(d) for d in dezenas if str(d).isdigit()]
 
-        return {
+        resultado = {
             "numero": numero,
             "dataApuracao": data_apuracao,
             "dezenas": dezenas
         }
+        _CACHE_API.update(
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            resultado=resultado,
+            instante=agora,
+        )
+        return resultado
 
     except Exception as e:
         print(f"❌ Erro ao acessar API da Caixa: {e}")
         return None
 
+def _ultimo_concurso_csv(conteudo):
+    """Número do concurso na última linha de um CSV (bytes) no formato Concurso,Data,Bola1..Bola15."""
+    ultima_linha = conteudo.strip().rsplit(b"\n", 1)[-1]
+    return int(ultima_linha.split(b",", 1)[0])
+
+
+def _ultimo_concurso_csv_remoto(repo_nome, file_path, token, branch="main"):
+    """
+    Lê só o final do CSV no GitHub (Range: últimos 1 KB via raw.githubusercontent.com)
+    e retorna o número do último concurso salvo, ou None se não for possível.
+    O raw passa por CDN (cache de alguns minutos): serve só para decidir se há
+    o que baixar, nunca como base do que é gravado.
+    """
+    try:
+        url = f"https://raw.githubusercontent.com/{repo_nome}/{branch}/{file_path}"
+        r = requests.get(url, headers={"Authorization": f"token {token}", "Range": "bytes=-1024"}, timeout=10)
+        if r.status_code not in (200, 206):
+            return None
+        return _ultimo_concurso_csv(r.content)
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o final do CSV remoto: {e}")
+        return None
+
+
+_MAX_DOWNLOADS = 16  # requisições simultâneas à API da Caixa ao completar a base
+
+
+def _baixar_concurso(sessao, base_url, headers, numero):
+    """Busca um concurso na API da Caixa e retorna a linha [Concurso, Data, Bola1..Bola15] ou None."""
+    try:
+        r = sessao.get(f"{base_url}/{numero}", headers=headers, timeout=10)
+        if r.status_code != 200:
+            print(f"⚠️ Concurso {numero} não encontrado (pode não ter sido sorteado ainda).")
+            return None
+
+        dados = r.json()
+        dezenas = [int(d) for d in dados.get("listaDezenas", [])]
+        data_apuracao = dados.get("dataApuracao", "")
+        print(f"✅ Concurso {numero} obtido com sucesso.")
+        return [str(numero), data_apuracao] + [str(d) for d in dezenas]
+    except Exception as e:
+        print(f"⚠️ Erro ao buscar concurso {numero}: {e}")
+        return None
+
+
 def atualizar_csv_github():
     """
     Atualiza o arquivo Lotofacil.csv (ou GitHub) com novos concursos.
@@ -521,45 +774,53 @@ def atualizar_csv_github():
         if not token:
             return "❌ Token do GitHub não encontrado. Configure GH_TOKEN como segredo."
 
-        g = Github(token)
-        repo = g.get_repo("mulequim/lotofacil")  # ✅ mantenha seu repositório aqui
+        repo_nome = "mulequim/lotofacil"          # ✅ mantenha seu repositório aqui
         file_path = "Lotofacil_Concursos.csv"     # ✅ nome do arquivo simplificado
-        contents = repo.get_contents(file_path)
 
-        csv_data = base64.b64decode(contents.content).decode("utf-8").strip().split("\n")
-        linhas = [l.split(",") for l in csv_data]
-
-        # 3️⃣ Detecta último concurso salvo
-        ultimo_no_csv = int(linhas[-1][0])
+        # 3️⃣ Detecta último concurso salvo lendo só o final do arquivo;
+        #    o CSV completo só é baixado se houver concursos novos.
+        ultimo_no_csv = _ultimo_concurso_csv_remoto(repo_nome, file_path, token)
+        contents = None
+        if ultimo_no_csv is None:
+            repo = Github(token).get_repo(repo_nome)
+            contents = repo.get_contents(file_path)
+            ultimo_no_csv = _ultimo_concurso_csv(contents.decoded_content)
         print(f"📄 Último concurso salvo: {ultimo_no_csv} | Último disponível: {ultimo_disponivel}")
 
         if ultimo_no_csv >= ultimo_disponivel:
             return f"✅ Base já está atualizada até o concurso {ultimo_no_csv}."
 
-        novos_concursos = []
-
-        # 4️⃣ Baixa concursos faltantes um por um (em ordem)
-        for numero in range(ultimo_no_csv + 1, ultimo_disponivel + 1):
-            url = f"{base_url}/{numero}"
-            r = requests.get(url, headers=headers, timeout=10)
-            if r.status_code != 200:
-                print(f"⚠️ Concurso {numero} não encontrado (pode não ter sido sorteado ainda).")
-                continue
-
-            dados = r.json()
-            dezenas = [int(d) for d in dados.get("listaDezenas", [])]
-            data_apuracao = dados.get("dataApuracao", "")
-
-            nova_linha = [str(numero), data_apuracao] + [str(d) for d in dezenas]
-            novos_concursos.append(nova_linha)
-            print(f"✅ Concurso {numero} obtido com sucesso.")
+        # 4️⃣ Baixa concursos faltantes em paralelo (conexões reaproveitadas)
+        #    e reordena pelo número antes de gravar
+        numeros = range(ultimo_no_csv + 1, ultimo_disponivel + 1)
+        with requests.Session() as sessao:
+            adaptador = HTTPAdapter(pool_connections=_MAX_DOWNLOADS, pool_maxsize=_MAX_DOWNLOADS)
+            sessao.mount("https://", adaptador)
+            with ThreadPoolExecutor(max_workers=min(_MAX_DOWNLOADS, len(numeros))) as executor:
+                futuros = [executor.submit(_baixar_concurso, sessao, base_url, headers, n) for n in numeros]
+                resultados = [f.result() for f in as_completed(futuros)]
+        novos_concursos = sorted((l for l in resultados if l is not None), key=lambda l: int(l[0]))
 
         # 5️⃣ Atualiza arquivo no GitHub
         if not novos_concursos:
             return "⚠️ Nenhum novo concurso foi adicionado."
 
-        linhas.extend(novos_concursos)
-        novo_csv = "\n".join([",".join(l) for l in linhas])
+        if contents is None:
+            repo = Github(token).get_repo(repo_nome)
+            contents = repo.get_contents(file_path)
+
+        # o último concurso vem do conteúdo que será de fato gravado (o final lido
+        # pelo raw pode estar defasado pela CDN): nada já salvo entra de novo
+        ultimo_salvo = _ultimo_concurso_csv(contents.decoded_content)
+        novos_concursos = [l for l in novos_concursos if int(l[0]) > ultimo_salvo]
+        if not novos_concursos:
+            return f"✅ Base já está atualizada até o concurso {ultimo_salvo}."
+
+        # acrescenta as novas linhas aos bytes existentes (sem re-separar o arquivo inteiro);
+        # csv.writer num buffer único cuida do escape caso algum campo venha com vírgula/aspas
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(novos_concursos)
+        novo_csv = contents.decoded_content.strip() + b"\n" + buffer.getvalue().rstrip("\n").encode("utf-8")
 
         repo.update_file(
             path=file_path,
@@ -588,32 +849,63 @@ def avaliar_jogos_historico(df, jogos):
     if not dezenas_cols:
         return pd.DataFrame(columns=["Jogo", "Dezenas", "11 pts", "12 pts", "13 pts", "14 pts", "15 pts"])
         
-    df_dezenas = df[dezenas_cols].apply(pd.to_numeric, errors='coerce')
-    concursos = [set(row.dropna().astype(int)) for _, row in df_dezenas.iterrows() if len(row.dropna()) >= 15]
-    
+    concursos = _mascaras_concursos(df)[_concursos_completos(df)]
+
     jogos_list = [item[0] if isinstance(item, tuple) else item for item in jogos]
-    
+    if not jogos_list:
+        return pd.DataFrame(columns=["Jogo", "Dezenas", "11 pts", "12 pts", "13 pts", "14 pts", "15 pts"])
+
+    mascaras = np.array([_mascara_jogo(jogo) for jogo in jogos_list], dtype=np.uint32)
+    histograma = _histograma_acertos(mascaras, concursos)
+
     linhas = []
-    for idx, jogo in enumerate(jogos_list, start=1):
-        cont = defaultdict(int)
-        jogo_set = set(jogo)
-        for sorteadas in concursos:
-            acertos = len(jogo_set & sorteadas)
-            if acertos >= 11:
-                cont[acertos] += 1
+    for idx, (jogo, cont) in enumerate(zip(jogos_list, histograma), start=1):
         linhas.append({
             "Jogo": idx,
             "Dezenas": " ".join(f"{d:02d}" for d in sorted(jogo)),
-            "11 pts": cont[11],
-            "12 pts": cont[12],
-            "13 pts": cont[13],
-            "14 pts": cont[14],
-            "15 pts": cont[15],
+            "11 pts": int(cont[11]),
+            "12 pts": int(cont[12]),
+            "13 pts": int(cont[13]),
+            "14 pts": int(cont[14]),
+            "15 pts": int(cont[15]),
         })
     return pd.DataFrame(linhas)
 
 
-def gerar_pdf_jogos(jogos, nome="Bolão", participantes="", pix=""):
-    """Gera o arquivo PDF do bolão (Simulação)."""
-    # Implementação simplificada/simulada.
-    return "bolao_gerado.pdf"
+def gerar_pdf_jogos(jogos, nome="Bolão", participantes="", pix="", buf=None):
+    """
+    Gera o PDF do bolão.
+    - buf: se informado (ex.: io.BytesIO), o PDF é escrito nele e os bytes são
+      retornados, prontos para st.download_button — nada é gravado em disco.
+    - sem buf: grava "bolao_gerado.pdf" e retorna o nome do arquivo.
+    """
+    destino = buf if buf is not None else "bolao_gerado.pdf"
+    if isinstance(participantes, (list, tuple)):
+        participantes = ", ".join(participantes)
+    jogos_list = [item[0] if isinstance(item, tuple) else item for item in jogos]
+
+    c = canvas.Canvas(destino, pagesize=A4)
+    _, altura = A4
+    y = altura - 2 * cm
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(2 * cm, y, nome)
+    y -= 1 * cm
+
+    c.setFont("Helvetica", 10)
+    for rotulo, valor in (("Participantes", participantes), ("Pix", pix)):
+        if valor:
+            c.drawString(2 * cm, y, f"{rotulo}: {valor}")
+            y -= 0.6 * cm
+    y -= 0.4 * cm
+
+    c.setFont("Courier", 11)
+    for idx, jogo in enumerate(jogos_list, start=1):
+        if y < 2 * cm:
+            c.showPage()
+            c.setFont("Courier", 11)
+            y = altura - 2 * cm
+        c.drawString(2 * cm, y, f"Jogo {idx:02d}: " + " ".join(f"{int(d):02d}" for d in sorted(jogo)))
+        y -= 0.6 * cm
+    c.save()
+
+    return buf.getvalue() if buf is not None else destino